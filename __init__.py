@@ -3,6 +3,8 @@ Package for controlling the DLCPro laser controllers via a telnet connection.
 The base connection is created by using the `Command` class, which in
 turn provides a Python wrapper around the telnet command interfaces.  There is a
 similar `Monitor` class available if the `rx` module is available to Python.
+Software feedback loops over the command interface are provided by the `control`
+module.
 
 A lower-level interaction can be found in the `telnet` package, which provides
 classes `telnet.Command` and `telnet.Monitor`, which can be used separately.
@@ -31,6 +33,6 @@ from .instrument import *
 
 from . import errors as _errors
 from . import instrument as _instrument
-from . import telnet, parse
+from . import telnet, parse, control
 
-__all__ = _errors.__all__ + _instrument.__all__ + ['telnet', 'parse']
+__all__ = _errors.__all__ + _instrument.__all__ + ['telnet', 'parse', 'control']
@@ -0,0 +1,225 @@
+"""
+Software feedback loops run over the command interface, for locking a parameter
+read back from the machine by adjusting another parameter on it, for example
+stabilising a reading by adjusting `laser1:dl:pc:voltage-set`.
+
+The `Loop` class runs the loop, and takes any controller which is a callable
+    controller(value: float, dt: float in s) -> output: float
+where `value` is the latest readback and `dt` the time since the one before it.
+The `PID` class is provided as a standard controller.
+"""
+
+from . import canonicalise, MachineError
+import collections
+import math
+import threading
+import time
+
+__all__ = ['PID', 'Loop', 'LoopStatistics']
+
+LoopStatistics = collections.namedtuple('LoopStatistics',
+                                        ['steps', 'rate', 'latency', 'jitter'])
+LoopStatistics.__doc__ =\
+    """LoopStatistics(steps: int, rate: float in Hz, latency: float in s,
+                      jitter: float in s)
+
+    The performance achieved by a run of a `Loop`.  `rate` is the mean number of
+    loop steps per second, `latency` is the mean round-trip time of the combined
+    actuator write and readback on the connection, and `jitter` is the standard
+    deviation of the time between successive readbacks."""
+
+def _clamp(value, low, high):
+    return min(max(value, low), high)
+
+def _raise_machine_error(code, message):
+    """Error callback which always raises, so that the return value of an error
+    callback on the connection is never mistaken for a readback."""
+    raise MachineError(code, message)
+
+class PID:
+    """A proportional-integral-derivative controller, for use with `Loop`.
+
+    The integral term is accumulated in output units, so `ki` can be changed on
+    a running controller without causing a jump in the output.  The derivative
+    term acts on the readback rather than the error, so changing the setpoint
+    only causes a jump through the proportional term.  Changing `kp` or `kd`
+    also makes the output jump."""
+    def __init__(self, kp, ki=0.0, kd=0.0, setpoint=0.0, limits=None):
+        """Arguments:
+        kp: float -- The proportional gain.
+        ki: float in 1/s -- The integral gain.
+        kd: float in s -- The derivative gain.
+        setpoint: float -- The readback value which the controller aims for.
+        limits: (low: float, high: float) | None --
+            If given, the integral term is clamped to this range, to stop it
+            winding up while the output is saturated.  This should typically be
+            the same range as the actuator limits of the `Loop`."""
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.setpoint = setpoint
+        self.limits = limits
+        self.reset()
+
+    def reset(self, output=0.0):
+        """reset(output: float) -> None
+
+        Clear the history of the controller, and set the integral term so that
+        the output starts from `output` when the readback is at the setpoint.
+        `Loop` calls this with the current value of the actuator before it
+        starts, so that the loop takes over without a jump."""
+        self.__integral = output
+        self.__previous = None
+
+    def __call__(self, value, dt):
+        """__call__(value: float, dt: float in s) -> output: float
+
+        Calculate the next output of the controller, given the latest readback
+        `value`, which was taken `dt` seconds after the previous one."""
+        error = self.setpoint - value
+        self.__integral += self.ki * error * dt
+        if self.limits is not None:
+            self.__integral = _clamp(self.__integral, *self.limits)
+        if self.__previous is None or dt <= 0:
+            derivative = 0.0
+        else:
+            derivative = (self.__previous - value) / dt
+        self.__previous = value
+        return self.kp * error + self.__integral + self.kd * derivative
+
+class Loop:
+    """A feedback loop which repeatedly reads a parameter from the machine,
+    passes it to a controller, and writes the controller output to another
+    parameter on the machine.
+
+    Each actuator write is sent together with the following readback using
+    `Command.set_query`, so every step of the loop costs a single round trip on
+    the connection, rather than one for the write and one for the read.  The
+    actuator range and rate limits are enforced here, before anything is sent
+    to the machine."""
+    def __init__(self, command, readback, actuator, controller,
+                 limits=None, max_rate=None):
+        """Arguments:
+        command: Command -- The open command connection to the machine.
+        readback: str | byte str -- The parameter to read on each step.
+        actuator: str | byte str -- The parameter to set on each step.
+        controller: value: float, dt: float in s -> output: float --
+            The controller, which is called with each readback and the time
+            since the previous one, and returns the new value of the actuator.
+            If it has a `reset` method, this is called with the current actuator
+            value before the loop starts.
+        limits: (low: float, high: float) | None --
+            The range the actuator is allowed to be set within.  Controller
+            outputs outside this range are clamped to it.  The actuator must
+            already be inside this range when the loop is started.
+        max_rate: float in units/s | None --
+            The maximum rate of change of the actuator.  Larger steps requested
+            by the controller are reduced to this rate.
+
+        Raises:
+        ValueError -- If the limits are empty, or `max_rate` is not positive."""
+        if limits is not None and limits[0] > limits[1]:
+            raise ValueError("Invalid actuator limits {}.".format(limits))
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError("Invalid maximum rate {}.".format(max_rate))
+        self.command = command
+        self.readback = canonicalise(readback)
+        self.actuator = canonicalise(actuator)
+        self.controller = controller
+        self.limits = limits
+        self.max_rate = max_rate
+        self.running = False
+        self.__stop = threading.Event()
+
+    def __limit(self, output, previous, dt):
+        """Apply the rate and range limits to a controller output, given the
+        previous value of the actuator and the time step.
+
+        Raises:
+        ValueError -- If the controller output is not a finite number."""
+        if not math.isfinite(output):
+            raise ValueError("Controller output {} is not finite."
+                             .format(output))
+        if self.max_rate is not None:
+            step = self.max_rate * dt
+            output = _clamp(output, previous - step, previous + step)
+        if self.limits is not None:
+            output = _clamp(output, *self.limits)
+        return output
+
+    def stop(self):
+        """stop() -> None
+
+        Stop a running loop after its current step.  This can be called from
+        another thread, or from within the controller.  If the loop is not
+        running, the next call to `run` returns without making any steps."""
+        self.__stop.set()
+
+    def run(self, steps=None, duration=None):
+        """run(steps: int | None, duration: float in s | None)
+            -> LoopStatistics
+
+        Run the loop until `steps` steps have been made, `duration` seconds have
+        passed, or `stop` is called, whichever comes first.  If none of these
+        are given, the loop runs until `stop` is called.
+
+        Returns:
+        LoopStatistics -- The rate, latency and jitter achieved by the loop.
+
+        Raises:
+        MachineError --
+            If the machine returns an error for any command sent by the loop.
+            The loop stops, and any error callback on the command connection is
+            not called, since its return value cannot stand in for a readback.
+            If the error came from the actuator write, the state of the actuator
+            is unknown.
+        ValueError --
+            If the actuator does not start within `limits`, in which case the
+            loop does not start, since stepping into range would ignore
+            `max_rate`.  Also raised if the controller returns a value which is
+            not a finite number, for example because the readback was NaN.
+            Nothing is sent to the machine for that step."""
+        self.running = True
+        count = 0
+        latency = period_mean = period_m2 = 0.0
+        try:
+            actuator = self.command.query(self.actuator,
+                                          error_callback=_raise_machine_error)
+            if not math.isfinite(actuator) or (self.limits is not None and not
+                    self.limits[0] <= actuator <= self.limits[1]):
+                raise ValueError("Actuator value {} is outside the limits {}."
+                                 .format(actuator, self.limits))
+            if hasattr(self.controller, 'reset'):
+                self.controller.reset(actuator)
+            start = previous = time.perf_counter()
+            value = self.command.query(self.readback,
+                                       error_callback=_raise_machine_error)
+            last = time.perf_counter()
+            while not self.__stop.is_set()\
+                    and (steps is None or count < steps)\
+                    and (duration is None or last - start < duration):
+                dt = last - previous
+                actuator = self.__limit(self.controller(value, dt), actuator, dt)
+                sent = time.perf_counter()
+                value = self.command.set_query(
+                    self.actuator, actuator, self.readback,
+                    error_callback=_raise_machine_error)
+                previous, last = last, time.perf_counter()
+                count += 1
+                latency += last - sent
+                # Welford's algorithm, so long runs don't store every period.
+                period = last - previous
+                delta = period - period_mean
+                period_mean += delta / count
+                period_m2 += delta * (period - period_mean)
+        finally:
+            # Only clear the stop request once the loop has seen it, so one made
+            # during the initial queries is not lost.
+            self.__stop.clear()
+            self.running = False
+        if count == 0:
+            return LoopStatistics(0, 0.0, 0.0, 0.0)
+        return LoopStatistics(steps=count,
+                              rate=1.0 / period_mean if period_mean > 0 else 0.0,
+                              latency=latency / count,
+                              jitter=math.sqrt(period_m2 / count))
@@ -165,6 +165,56 @@ class Command:
         else:
             return out
 
+    @canonical
+    def set_query(self, set_parameter, value, query_parameter,
+                  error_callback=None):
+        """set_query(set_parameter: str, value: 'A, query_parameter: str)
+            -> response: 'B
+
+        Set the parameter `set_parameter` to `value`, and then query the value
+        of `query_parameter`.  This has the same effect as a call to `set`
+        followed by a call to `query`, but both commands are sent to the machine
+        before waiting for either response, so the pair costs only one round
+        trip over the connection rather than two.  This is most useful in
+        feedback loops, where it is the main limit on the achievable loop rate.
+
+        Arguments:
+        set_parameter: str | byte str --
+            The parameter to set on the machine.  If given as a `str`, it must
+            contain only ASCII characters.
+        value: 'A --
+            The value to set the parameter too.  This should be of the same type
+            expected by the command or an instrument error will likely occur.
+        query_parameter: str | byte str --
+            The parameter to query the value of after the set has completed.  If
+            given as a `str`, it must contain only ASCII characters.
+        error_callback: code: int, msg: str -> 'C --
+            The function which will be called instead of raising an exception if
+            an error state is return.  The first argument if the error code, and
+            the second argument is the error message received.  This takes
+            precedence over `LaserController.error_callback`.
+
+        Returns:
+        'B -- The response to the query, if both commands were successful.
+        'C --
+            The result of the error callback, if either command was
+            unsuccessful.  If the set fails, the callback is called with that
+            error and the query response is discarded.
+
+        Raises:
+        MachineError --
+            If an error is encountered and neither the per-function error
+            callback nor the class global error callback are defined."""
+        set_response, query_response =\
+            self.__command.set_query(set_parameter, parse.as_bytes(value),
+                                     canonicalise(query_parameter))
+        if parse.is_error(set_response):
+            return self.__handle_error(set_response, error_callback)
+        elif parse.is_error(query_response):
+            return self.__handle_error(query_response, error_callback)
+        else:
+            return parse.response(query_response)
+
     @canonical
     def do(self, command, *args, error_callback=None):
         response = self.__command.do(command, *map(parse.as_bytes, args))
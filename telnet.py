@@ -44,8 +44,13 @@ class Command:
             self.log.error("Connection operation timed out.")
             raise
 
+    def __format(self, *parts):
+        return b"(" + b" ".join(parts) + b")\n"
+
     def __send(self, *parts):
-        message = b"(" + b" ".join(parts) + b")\n"
+        self.__write(self.__format(*parts))
+
+    def __write(self, message):
         if self.closed:
             self.log.error("Connection closed, can't send message: "
                            + message.decode('utf-8')[:-1])
@@ -74,6 +79,40 @@ class Command:
         self.__send(QUERY_CMD, b"'" + parameter)
         return self.__receive()
 
+    def __receive_echoed(self, *messages):
+        # Read the responses to several messages which were sent in one write.
+        # Depending on when the machine echoes its input, the echo of a later
+        # message may arrive before the response to an earlier one, so rather
+        # than dropping the first line of each response, remove the echo of
+        # each message that was sent, and check that it really was there.
+        if self.closed:
+            raise ConnectionError("Connection is not open.")
+        received = b"".join(self.__connection.read_until(PROMPT)
+                            for _ in messages)
+        self.log.debug("Received responses: " + received.decode('utf-8'))
+        for message in messages:
+            echo = message.rstrip(b"\n")
+            pos = received.find(echo)
+            if pos < 0:
+                self.log.error("Missing echo of message: "
+                               + echo.decode('utf-8'))
+                raise ConnectionError("Responses out of step with commands.")
+            received = received[:pos] + received[pos + len(echo):]
+        responses = received.split(PROMPT)
+        if len(responses) != len(messages) + 1 or responses[-1]:
+            raise ConnectionError("Responses out of step with commands.")
+        return tuple(b"".join(response.split(NEW_LINE)).strip(NEW_LINE)
+                     for response in responses[:-1])
+
+    def set_query(self, set_parameter, value, query_parameter):
+        # Both commands go out in a single write, so the query is already
+        # waiting at the machine when it finishes the set.  The machine handles
+        # commands in order, so the responses come back in the order sent.
+        messages = (self.__format(SET_CMD, b"'" + set_parameter, value),
+                    self.__format(QUERY_CMD, b"'" + query_parameter))
+        self.__write(b"".join(messages))
+        return self.__receive_echoed(*messages)
+
     def close(self):
         if self.closed:
             return